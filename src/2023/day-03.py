@@ -1,17 +1,29 @@
+from contextlib import redirect_stdout
+import io
+import json
+import numpy as np
 import sys
 import textwrap
 import unittest
 
-def run():
+def run(verbose=False, text=False):
     with open("./input/2023-d03-input.txt", 'r') as file:
         input_data = [line.strip() for line in file.readlines()]
 
-    schematic = read_schematic(input_data)
-    [part_numbers, gears] = read_part_numbers(schematic)
-    print(part_numbers)
+    [part_numbers, gears] = find_part_numbers(input_data)
+    if verbose:
+        print(part_numbers)
 
-    print("** Part 1 Final: ", sum(part_numbers))
-    print("** Part 2 Final: ", gear_ratios(gears))
+    report(3, [sum(part_numbers), gear_ratios(gears)], text)
+
+# One JSON record per part, e.g. {"day": 3, "part": 1, "answer": 4361},
+# or the plain "** Part N Final" lines
+def report(day, answers, text=False):
+    for part, answer in enumerate(answers, 1):
+        if text:
+            print(f"** Part {part} Final: ", answer)
+        else:
+            print(json.dumps({'day': day, 'part': part, 'answer': int(answer)}))
 
 # add up all the part numbers
 # any number adjacent to a symbol, even diagonally, is a "part number" 
@@ -66,6 +78,58 @@ def is_a_part_number(schematic, row, n_begin, n_end, gears):
                 return num
     return None
 
+# The same part numbers and gears, from masks over the whole schematic
+def find_part_numbers(input_data):
+    width = max(len(line) for line in input_data)
+    grid = np.frombuffer(''.join(line.ljust(width, '.') for line in input_data).encode(), dtype=np.uint8).reshape(len(input_data), width)
+    digits = (grid >= ord('0')) & (grid <= ord('9'))
+    symbols = ~digits & (grid != ord('.'))
+    stars = grid == ord('*')
+
+    # numbers are runs of digits: find where each run starts and ends (exclusive) in its row
+    edges = np.diff(np.pad(digits, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    rows, begins = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+
+    # how many cells in a run are next to a symbol, from a running count along each row
+    near = np.pad(np.cumsum(dilate(symbols), axis=1), ((0, 0), (1, 0)))
+    is_part = near[rows, ends] - near[rows, begins] > 0
+    near_star = np.pad(np.cumsum(dilate(stars), axis=1), ((0, 0), (1, 0)))
+    is_geared = near_star[rows, ends] - near_star[rows, begins] > 0
+
+    # number each star, then spread the numbers to all 8 neighbours
+    star_cells = np.argwhere(stars)
+    labels = np.zeros(grid.shape, dtype=np.int64)
+    labels[stars] = np.arange(1, len(star_cells) + 1)
+    neighbours = shifted(labels)
+
+    part_numbers = []
+    gears = {}
+    for r, b, e, part, geared in zip(rows, begins, ends, is_part, is_geared):
+        if not part:
+            continue
+        num = int(grid[r, b:e].tobytes())
+        part_numbers.append(num)
+        if geared:
+            for label in np.unique(neighbours[:, r, b:e]):
+                if label:
+                    gear = tuple(int(x) for x in star_cells[label - 1])
+                    gears.setdefault(gear, []).append(num)
+
+    gears = dict(filter(lambda item: len(item[1]) == 2, gears.items()))
+    return [part_numbers, gears]
+
+# The grid and its 8 neighbouring shifts, stacked: cell (r, c) of each layer
+# holds the value from one of the cells around (r, c) (0 off the edge)
+def shifted(grid):
+    rows, cols = grid.shape
+    padded = np.pad(grid, 1)
+    return np.stack([padded[dr:dr+rows, dc:dc+cols] for dr in range(3) for dc in range(3)])
+
+# Mark every cell next to (or on) a marked cell
+def dilate(mask):
+    return shifted(mask).any(axis=0)
+
 def gear_ratios(gears):
     result = 0
     for value in gears.values():
@@ -101,10 +165,25 @@ class TestSolution(unittest.TestCase):
         result = gear_ratios(gears)
         self.assertEqual(result, 467835)
 
+        out = io.StringIO()
+        with redirect_stdout(out):
+            report(3, [sum(part_numbers), result])
+        self.assertEqual([json.loads(x) for x in out.getvalue().splitlines()],
+                         [{'day': 3, 'part': 1, 'answer': 4361}, {'day': 3, 'part': 2, 'answer': 467835}])
+
+        [numbers, found] = find_part_numbers(input_data)
+        self.assertEqual(numbers, part_numbers)
+        self.assertEqual(found, gears)
+        self.assertEqual(found, {(1, 3): [467, 35], (8, 5): [755, 598]})
+
+        # numbers at the edges of the grid, and a star touching only one number
+        input_data = ['12.*', '..4.', '5*..', '*..9']
+        self.assertEqual(find_part_numbers(input_data), [[4, 5], {(2, 1): [4, 5]}])
+
 
 if __name__ == "__main__":
     # Run unit tests if the script was run with the --test argument
     if '--test' in sys.argv:
         unittest.main(argv=['first-arg-is-ignored'], exit=False)
     else:
-        run()
\ No newline at end of file
+        run('--verbose' in sys.argv, '--text' in sys.argv)
\ No newline at end of file
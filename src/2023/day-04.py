@@ -10,22 +10,15 @@ class CardCounter:
     def __str__(self):
         return f'CardCounter(count={self.count}, num_winners={self.num_winners})'
 
-def run():
-    with open("./input/2023-d04-input.txt", 'r') as file:
-        input_data = [line.strip() for line in file.readlines()]
-
-    result = 0
-    card_data = read_cards(input_data)
-
-    ## Part 1
-    for card in card_data:
-        result += score(winning_numbers(card))
-
-    ## Part 2
-    cards = find_winning_cards(card_data)
+def run(stdin=False):
+    if stdin:
+        part1, part2 = stream_cards(sys.stdin)
+    else:
+        with open("./input/2023-d04-input.txt", 'r') as file:
+            part1, part2 = stream_cards(file)
 
-    print("** Part 1 Final: ", result)
-    print("** Part 2 Final: ", total(cards))
+    print("** Part 1 Final: ", part1)
+    print("** Part 2 Final: ", part2)
 
 # card has two lists of numbers separated by a vertical bar (|):
 #   a list of winning numbers and then a list of numbers you have
@@ -57,6 +50,69 @@ def winning_numbers(card):
     numbers = parts[1].split() # split on whitespace
     return list(filter(lambda x: x in winning_numbers, numbers))
 
+# Both lists as bitsets: bit n is set if n is on the card
+def card_bits(card):
+    parts = card.split('|')
+    winning = 0
+    for x in parts[0].split():
+        winning |= 1 << int(x)
+    numbers = 0
+    for x in parts[1].split():
+        numbers |= 1 << int(x)
+    return (winning, numbers)
+
+def card_matches(card_data):
+    return [(winning & numbers).bit_count() for winning, numbers in map(card_bits, card_data)]
+
+def points(matches):
+    return 1 << (matches - 1) if matches else 0
+
+# Each card adds its copies to the next `matches` cards. Keep that as a difference
+# array: add at the first card, subtract after the last, and carry a running sum.
+def count_cards(matches):
+    diff = [0] * (len(matches) + 1)
+    extra = 0
+    result = 0
+    for i, m in enumerate(matches):
+        extra += diff[i]
+        copies = 1 + extra
+        result += copies
+        if m:
+            diff[i + 1] += copies
+            diff[min(i + m + 1, len(matches))] -= copies
+    return result
+
+# Score cards one line at a time. Copies won by a card only reach the next
+# `matches` cards, so pending copies live in a ring buffer with one slot per
+# possible match (the count of winning numbers), plus one for the current card.
+def stream_cards(lines):
+    pending = []
+    part1 = 0
+    part2 = 0
+    i = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        card = line.split(':')[1]
+        size = len(card.split('|')[0].split()) + 1
+        if size > len(pending):
+            ring = [0] * size
+            for k in range(len(pending)):
+                ring[(i + k) % size] = pending[(i + k) % len(pending)]
+            pending = ring
+        winning, numbers = card_bits(card)
+        matches = (winning & numbers).bit_count()
+        slot = i % len(pending)
+        copies = 1 + pending[slot]
+        pending[slot] = 0
+        for k in range(1, matches + 1):
+            pending[(slot + k) % len(pending)] += copies
+        part1 += points(matches)
+        part2 += copies
+        i += 1
+    return (part1, part2)
+
 def total(cards):
     return sum(CardCounter.count for CardCounter in cards)
 
@@ -93,9 +149,21 @@ class TestSolution(unittest.TestCase):
         cards = find_winning_cards(card_data)
         self.assertEqual(total(cards), 30)
 
+        matches = card_matches(card_data)
+        self.assertEqual(matches, [4, 2, 2, 1, 0, 0])
+        self.assertEqual(sum(points(m) for m in matches), 13)
+        self.assertEqual(count_cards(matches), 30)
+
+        self.assertEqual(stream_cards(iter(input_data)), (13, 30))
+        # the ring grows if a later card has more winning numbers
+        input_data = ['Card 1: 1 | 1 2', 'Card 2: 1 2 3 | 1 2 3', 'Card 3: 4 | 5', 'Card 4: 6 | 7', 'Card 5: 1 | 1', 'Card 6: 2 | 3']
+        self.assertEqual(stream_cards(input_data), (6, 16))
+        self.assertEqual(count_cards(card_matches(read_cards(input_data))), 16)
+        self.assertEqual(stream_cards([]), (0, 0))
+
 if __name__ == "__main__":
     # Run unit tests if the script was run with the --test argument
     if '--test' in sys.argv:
         unittest.main(argv=['first-arg-is-ignored'], exit=False)
     else:
-        run()
\ No newline at end of file
+        run('--stdin' in sys.argv)
\ No newline at end of file
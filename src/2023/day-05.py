@@ -1,10 +1,22 @@
+from array import array
+from bisect import bisect_right
 from collections import namedtuple
-from intervaltree import Interval, IntervalTree
+from functools import partial
+from multiprocessing import Pool
+import numpy as np
 import sys
 import textwrap
 import unittest
 
+try:
+    from intervaltree import Interval, IntervalTree
+except ImportError:
+    IntervalTree = None
+
 Data = namedtuple('Data', ['dest', 'range'])
+Pieces = namedtuple('Pieces', ['starts', 'deltas'])
+
+SEQUENCE = ['seed-to-soil', 'soil-to-fertilizer', 'fertilizer-to-water', 'water-to-light', 'light-to-temperature', 'temperature-to-humidity', 'humidity-to-location']
 
 def run():
     with open("./input/2023-d05-input.txt", 'r') as file:
@@ -13,15 +25,13 @@ def run():
     maps = parse_map(input_data)
     seeds = maps.get('seeds')
 
-    locations = []
-    for seed in seeds:
-        locations.append(seed_to_location(maps, seed))
-    print("** Part 1 Final: ", min(locations))
+    locations = seeds_to_locations(maps, seeds)
+    print("** Part 1 Final: ", locations.min())
 
+    pieces = compile_map(maps)
     locations = []
     for i in range(0, len(seeds), 2):
-        locations.extend(seed_range_to_locations(maps, seeds[i], seeds[i+1]))
-    print("Hops: ", maps['hops'])
+        locations.append(range_to_min_location(pieces, seeds[i], seeds[i+1]))
 
     print("** Part 2 Final: ", min(locations))
 
@@ -29,15 +39,15 @@ def parse_map(input_data):
     input_data.append('') # add an empty line to the end of the input data
     maps = {}
     heading = ''
-    t = IntervalTree()
+    t = []
     for line in input_data:
         if line.startswith('seeds:'):
             seeds = [int(x) for x in line.split(':')[1].strip().split()]
             maps['seeds'] = seeds
         elif line == '':
             if (heading != ''):
-                maps[heading] = t
-                t = IntervalTree()
+                maps[heading] = RangeMap(t)
+                t = []
                 heading = ''
             continue
         elif line.endswith('map:'):
@@ -45,59 +55,177 @@ def parse_map(input_data):
             continue
         else:
             [dest, start, range] = [int(x) for x in line.split()]
-            t.add(Interval(start, start+range, Data(dest, range)))
+            t.append((start, start+range, dest-start))
     return maps
 
+# Sorted, non-overlapping ranges held in parallel columns: [start, end) maps to value + delta
+class RangeMap:
+    def __init__(self, ranges=()):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.deltas = array('q')
+        for start, end, delta in sorted(ranges):
+            self.starts.append(start)
+            self.ends.append(end)
+            self.deltas.append(delta)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends, self.deltas)
+
+    # Values not covered by any range map to themselves
+    def lookup(self, i):
+        j = bisect_right(self.starts, i) - 1
+        if j >= 0 and i < self.ends[j]:
+            return i + self.deltas[j]
+        return i
+
+    # lookup for a whole NumPy array of values at once
+    def lookup_all(self, values):
+        if not self.starts:
+            return values
+        starts = np.frombuffer(self.starts, dtype=np.int64)
+        ends = np.frombuffer(self.ends, dtype=np.int64)
+        deltas = np.frombuffer(self.deltas, dtype=np.int64)
+        j = np.searchsorted(starts, values, side='right') - 1
+        hit = (j >= 0) & (values < ends[j])
+        return values + np.where(hit, deltas[j], 0)
+
+    # (start, end, delta) for every range overlapping [begin, end)
+    def overlap(self, begin, end):
+        j = max(bisect_right(self.starts, begin) - 1, 0)
+        while j < len(self.starts) and self.starts[j] < end:
+            if self.ends[j] > begin:
+                yield (self.starts[j], self.ends[j], self.deltas[j])
+            j += 1
+
+    # Split [begin, end) into consecutive (begin, end, delta) segments,
+    # using a delta of 0 for the gaps between ranges
+    def split(self, begin, end):
+        for start, stop, delta in self.overlap(begin, end):
+            if begin < start:
+                yield (begin, start, 0)
+                begin = start
+            stop = min(stop, end)
+            yield (begin, stop, delta)
+            begin = stop
+        if begin < end:
+            yield (begin, end, 0)
+
+    def to_tree(self):
+        if IntervalTree is None:
+            raise ImportError("intervaltree is not installed")
+        return IntervalTree(Interval(start, end, Data(start + delta, end - start)) for start, end, delta in self)
+
+# Compose all of the maps into a single piecewise map from seed to location.
+# Piece i covers [starts[i], starts[i+1]) (the last piece is open-ended),
+# and maps every value in that range by adding deltas[i].
+def compile_map(maps):
+    pieces = Pieces([0], [0])
+    for key in SEQUENCE:
+        pieces = compose(pieces, range_pieces(maps.get(key)))
+    return pieces
+
+# Flatten one map into pieces, filling gaps between ranges with identity pieces
+def range_pieces(ranges):
+    starts = [0]
+    deltas = [0]
+    for start, end, delta in ranges:
+        if start != starts[-1]:
+            starts.append(start)
+            deltas.append(delta)
+        else:
+            deltas[-1] = delta
+        starts.append(end)
+        deltas.append(0)
+    return Pieces(starts, deltas)
+
+# Pieces for g(f(x)): split each piece of f where its image crosses a boundary of g
+def compose(f, g):
+    starts = []
+    deltas = []
+    for i, begin in enumerate(f.starts):
+        end = f.starts[i+1] if i+1 < len(f.starts) else None
+        delta = f.deltas[i]
+        j = bisect_right(g.starts, begin + delta) - 1
+        while True:
+            append_piece(starts, deltas, begin, delta + g.deltas[j])
+            j += 1
+            if j >= len(g.starts):
+                break
+            begin = g.starts[j] - delta
+            if end is not None and begin >= end:
+                break
+    return Pieces(starts, deltas)
+
+def append_piece(starts, deltas, begin, delta):
+    if deltas and deltas[-1] == delta:
+        return # same mapping as the previous piece; merge them
+    starts.append(begin)
+    deltas.append(delta)
+
+def location(pieces, seed):
+    i = bisect_right(pieces.starts, seed) - 1
+    return seed + pieces.deltas[i]
+
+# Each piece is increasing, so the lowest location in a seed range
+# is at the start of one of the pieces it overlaps.
+def range_to_min_location(pieces, begin, range):
+    end = begin + range
+    i = bisect_right(pieces.starts, begin) - 1
+    result = begin + pieces.deltas[i]
+    i += 1
+    while i < len(pieces.starts) and pieces.starts[i] < end:
+        result = min(result, pieces.starts[i] + pieces.deltas[i])
+        i += 1
+    return result
+
 def seed_range_to_locations(maps, begin, range):
-    sequence = ['seed-to-soil', 'soil-to-fertilizer', 'fertilizer-to-water', 'water-to-light', 'light-to-temperature', 'temperature-to-humidity', 'humidity-to-location']
-    locations = []
-    maps['hops'] = 0
-    check_range(maps, sequence, 0, locations, begin, begin+range)
+    locations, _ = check_range(maps, begin, begin+range)
     return locations
 
-def check_range(maps, sequence, s, locations, begin, end):
-    maps['hops'] += 1
-    if (s >= len(sequence)):
-        locations.append(begin)
-        return
-    key = sequence[s]
-    tree = maps.get(key)
-    ranges = tree[begin:end]
-    leftover = []
-    if ranges:
-        for item in ranges:
-            delta = item.data.dest - item.begin
-            if item.begin <= begin and end <= item.end:
-                # completely enveloped range
-                check_range(maps, sequence, s + 1, locations, begin + delta, end + delta)
-                return
-            elif item.begin <= begin:
-                # partially overlapping range
-                check_range(maps, sequence, s + 1, locations, begin + delta, item.end + delta)
-                leftover.append((item.end, end))
-            elif item.end >= end:
-                # partially overlapping range
-                check_range(maps, sequence, s + 1, locations, item.begin + delta, end + delta)
-                leftover.append((begin, item.begin))
-    else:
-        check_range(maps, sequence, s + 1, locations, begin, end)
+# Push [begin, end) through every map, using a worklist of (stage, begin, end)
+# rather than recursion. Returns the start of every location range and the number of hops.
+def check_range(maps, begin, end):
+    locations = []
+    hops = 0
+    work = [(0, begin, end)]
+    while work:
+        s, begin, end = work.pop()
+        hops += 1
+        if s >= len(SEQUENCE):
+            locations.append(begin)
+            continue
+        for (b, e, delta) in maps.get(SEQUENCE[s]).split(begin, end):
+            work.append((s + 1, b + delta, e + delta))
+    return (locations, hops)
+
+def min_location(maps, begin, range):
+    locations, hops = check_range(maps, begin, begin+range)
+    return (min(locations), hops)
 
-    ## Sloppy, but it works.
-    for (begin, end) in leftover:
-        check_range(maps, sequence, s, locations, begin, end)
+# Resolve each seed range on a separate worker; only the minimum location
+# and the hop count come back from each one.
+def parallel_min_location(maps, seeds, processes=None):
+    pairs = [(seeds[i], seeds[i+1]) for i in range(0, len(seeds), 2)]
+    with Pool(processes) as pool:
+        results = pool.starmap(partial(min_location, maps), pairs)
+    return (min(x[0] for x in results), sum(x[1] for x in results))
 
 def seed_to_location(maps, seed):
-    sequence = ['seed-to-soil', 'soil-to-fertilizer', 'fertilizer-to-water', 'water-to-light', 'light-to-temperature', 'temperature-to-humidity', 'humidity-to-location']
     i = seed
-    for key in sequence:
-        tree = maps.get(key)
-        if tree and tree[i]:
-            for item in tree[i]:
-                data = item.data
-                i = data.dest + (i - item.begin)
-
+    for key in SEQUENCE:
+        i = maps.get(key).lookup(i)
     return i
 
+def seeds_to_locations(maps, seeds):
+    values = np.asarray(seeds, dtype=np.int64)
+    for key in SEQUENCE:
+        values = maps.get(key).lookup_all(values)
+    return values
+
 class TestSolution(unittest.TestCase):
     def test(self):
         input_data = textwrap.dedent("""
@@ -138,6 +266,16 @@ class TestSolution(unittest.TestCase):
 
 
         maps = parse_map(input_data)
+        ranges = maps.get('seed-to-soil')
+        self.assertEqual(list(ranges), [(50, 98, 2), (98, 100, -48)])
+        self.assertEqual(ranges.lookup(49), 49)
+        self.assertEqual(ranges.lookup(50), 52)
+        self.assertEqual(ranges.lookup(99), 51)
+        self.assertEqual(ranges.lookup(100), 100)
+        self.assertEqual(list(ranges.overlap(0, 51)), [(50, 98, 2)])
+        self.assertEqual(list(ranges.split(40, 110)), [(40, 50, 0), (50, 98, 2), (98, 100, -48), (100, 110, 0)])
+        self.assertEqual(list(ranges.split(60, 70)), [(60, 70, 2)])
+
         # Seed 79, soil 81, fertilizer 81, water 81, light 74, temperature 78, humidity 78, location 82.
         self.assertEqual(seed_to_location(maps, 79), 82)
         # Seed 14, soil 14, fertilizer 53, water 49, light 42, temperature 42, humidity 43, location 43.
@@ -148,9 +286,27 @@ class TestSolution(unittest.TestCase):
         self.assertEqual(seed_to_location(maps, 13), 35)
 
 
+        self.assertEqual(seeds_to_locations(maps, [79, 14, 55, 13]).tolist(), [82, 43, 86, 35])
+        seeds = np.arange(0, 110)
+        self.assertEqual(seeds_to_locations(maps, seeds).tolist(), [seed_to_location(maps, x) for x in range(0, 110)])
+
         locations = seed_range_to_locations(maps, 79, 14)
         self.assertEqual(min(locations), 46)
 
+        pieces = compile_map(maps)
+        self.assertEqual(location(pieces, 79), 82)
+        self.assertEqual(location(pieces, 14), 43)
+        self.assertEqual(location(pieces, 55), 86)
+        self.assertEqual(location(pieces, 13), 35)
+        for seed in range(0, 110):
+            self.assertEqual(location(pieces, seed), seed_to_location(maps, seed))
+
+        self.assertEqual(range_to_min_location(pieces, 79, 14), 46)
+        self.assertEqual(range_to_min_location(pieces, 55, 13), 56)
+
+        self.assertEqual(min_location(maps, 79, 14), (46, 12))
+        self.assertEqual(parallel_min_location(maps, maps.get('seeds'), 2), (46, 27))
+
 if __name__ == "__main__":
     # Run unit tests if the script was run with the --test argument
     if '--test' in sys.argv:
@@ -1,4 +1,6 @@
 from collections import namedtuple
+import math
+import numpy as np
 import sys
 import textwrap
 import unittest
@@ -45,7 +47,7 @@ def race_records(input_data, strip=False):
 def find_optimal_button_press_time(records):
     ways_to_win = 1
     for record in records:
-        ways_to_win *= winners_for_race(record)
+        ways_to_win *= solve_race(record)
     return ways_to_win
 
 def winners_for_race(race):
@@ -56,6 +58,40 @@ def winners_for_race(race):
             winners += 1
     return winners
 
+# Winning button times satisfy bt * (tt - bt) > distance, so they lie strictly
+# between the roots of bt^2 - tt*bt + distance = 0: (tt +/- sqrt(tt^2 - 4*distance)) / 2.
+# isqrt gets within one of the lower root; nudge it to the first winning time.
+def solve_race(race):
+    disc = race.time * race.time - 4 * race.distance
+    if disc <= 0:
+        return 0
+    bt = (race.time - math.isqrt(disc)) // 2
+    while bt * (race.time - bt) <= race.distance:
+        bt += 1
+        if 2 * bt > race.time:
+            return 0
+    while bt > 0 and (bt - 1) * (race.time - bt + 1) > race.distance:
+        bt -= 1
+    # the winning times are symmetric around tt / 2
+    return max(race.time - 2 * bt + 1, 0)
+
+# solve_race for arrays of times and distances.
+# Times of 2^31 or more would overflow tt^2 in int64, and distances of 2^61 or more
+# would overflow 4*distance, so those fall back to solve_race.
+def solve_races(times, distances):
+    times = np.asarray(times, dtype=np.int64)
+    distances = np.asarray(distances, dtype=np.int64)
+    if times.size and (times.max() >= 2**31 or distances.max() >= 2**61):
+        return np.array([solve_race(RaceRecord(int(t), int(d))) for t, d in zip(times, distances)], dtype=np.int64)
+    disc = times * times - 4 * distances
+    bt = (times - np.sqrt(np.maximum(disc, 0)).astype(np.int64)) // 2
+    # float sqrt is only off by one or two here; correct it with exact integer math
+    for _ in range(2):
+        bt += bt * (times - bt) <= distances
+    for _ in range(2):
+        bt -= (bt > 0) & ((bt - 1) * (times - bt + 1) > distances)
+    return np.where(disc > 0, np.maximum(times - 2 * bt + 1, 0), 0)
+
 # total time (tt), button time (bt); return distance traveled
 def button_to_distance(tt, bt):
     mt = tt - bt
@@ -83,11 +119,26 @@ class TestSolution(unittest.TestCase):
         self.assertEqual(winners_for_race(records[1]), 8)
         self.assertEqual(winners_for_race(records[2]), 9)
 
+        self.assertEqual(solve_race(records[0]), 4)
+        self.assertEqual(solve_race(records[1]), 8)
+        self.assertEqual(solve_race(records[2]), 9)
+        self.assertEqual(solve_races([r.time for r in records], [r.distance for r in records]).tolist(), [4, 8, 9])
+
         self.assertEqual(find_optimal_button_press_time(records), 288)
 
         records = race_records(input_data, True)
         self.assertEqual(find_optimal_button_press_time(records), 71503)
 
+        # boundary cases: exact ties do not win, and no race can be won
+        for t in range(0, 40):
+            for d in range(0, 420, 7):
+                race = RaceRecord(t, d)
+                self.assertEqual(solve_race(race), winners_for_race(race))
+        self.assertEqual(solve_races([10, 10, 10, 4], [24, 25, 21, 4]).tolist(), [1, 0, 3, 0])
+        self.assertEqual(solve_races([2**32], [2**62 - 12345]).tolist(), [solve_race(RaceRecord(2**32, 2**62 - 12345))])
+        self.assertEqual(solve_races([10, 7], [2**62, 9]).tolist(), [0, 4])
+        self.assertEqual(solve_races([10], [2**61]).tolist(), [solve_race(RaceRecord(10, 2**61))])
+
 
 if __name__ == "__main__":
     # Run unit tests if the script was run with the --test argument
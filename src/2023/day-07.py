@@ -1,8 +1,12 @@
 from collections import namedtuple
 from enum import Enum
+from functools import cache
 from itertools import groupby
 from operator import attrgetter
+import numpy as np
+import os
 import sys
+import tempfile
 import textwrap
 import unittest
 
@@ -40,15 +44,12 @@ def run():
 # Rank hands from weakest (1) to strongest (n)
 # Total winnings: add up the result of bid*rank for each hand
 
-def get_hands(input_data, joker=False):
+def get_hands(input_data, joker=False, path=None):
+    table = hand_types(joker, path)
     hands = []
     for line in input_data:
         hand, bid = line.split(' ')
-        if joker:
-            type = classify_hand_joker(hand)
-        else:
-            type = classify_hand(hand)
-        hands.append(Hand(hand, type, int(bid)))
+        hands.append(Hand(hand, HandType(table[hand_index(hand)]), int(bid)))
     return hands
 
 # Five of a kind: All cards have the same label 1.
@@ -103,12 +104,87 @@ def group_to_type(result):
         return HandType.ONE_PAIR
     return HandType.HIGH_CARD
 
+# Every hand as a base-13 number, one digit per card
+LABELS = '23456789TJQKA'
+LABEL_INDEX = {label: i for i, label in enumerate(LABELS)}
+
+def hand_index(cards):
+    index = 0
+    for c in cards:
+        index = index * 13 + LABEL_INDEX[c]
+    return index
+
+def hand_indexes(hands):
+    return np.fromiter((hand_index(hand.cards) for hand in hands), dtype=np.int64, count=len(hands))
+
+# HandType values for all 13^5 hands, indexed by hand_index: (standard, joker).
+# With a path, the tables are loaded from (or saved to) that .npz file;
+# the extension is added if missing, as np.savez_compressed would.
+@cache
+def hand_type_tables(path=None):
+    if path and not path.endswith('.npz'):
+        path += '.npz'
+    if path and os.path.exists(path):
+        with np.load(path) as data:
+            return (data['standard'], data['joker'])
+
+    index = np.arange(13**5)
+    digits = np.stack([index // 13**(4-k) % 13 for k in range(5)], axis=1)
+    same = digits[:, :, None] == digits[:, None, :]
+    largest = same.sum(axis=2).max(axis=1)
+    labels = (~(same & np.tri(5, k=-1, dtype=bool)).any(axis=2)).sum(axis=1)
+
+    # same decisions as group_to_type, from the number of labels and the largest group
+    shapes = np.zeros((6, 6), dtype=np.uint8)
+    shapes[1, 5] = HandType.FIVE_OF_A_KIND.value
+    shapes[2, 4] = HandType.FOUR_OF_A_KIND.value
+    shapes[2, 3] = HandType.FULL_HOUSE.value
+    shapes[3, 3] = HandType.THREE_OF_A_KIND.value
+    shapes[3, 2] = HandType.TWO_PAIR.value
+    shapes[4, 2] = HandType.ONE_PAIR.value
+    shapes[5, 1] = HandType.HIGH_CARD.value
+    standard = shapes[labels, largest]
+
+    # same upgrades as classify_hand_joker, by number of jokers and standard type
+    upgrades = np.zeros((6, 8), dtype=np.uint8)
+    for jokers in range(6):
+        for type in HandType:
+            upgrades[jokers, type.value] = JOKER_UPGRADES.get((jokers, type), JOKER_DEFAULT_UPGRADES.get(jokers, type)).value
+    joker = upgrades[(digits == LABEL_INDEX['J']).sum(axis=1), standard]
+
+    if path:
+        np.savez_compressed(path, standard=standard, joker=joker)
+    return (standard, joker)
+
+def hand_types(joker=False, path=None):
+    return hand_type_tables(path)[1 if joker else 0]
+
+# HandType values for an array of hand indexes
+def classify_indexes(indexes, joker=False, path=None):
+    return hand_types(joker, path)[indexes]
+
 def rank_hands(hands, joker=False):
-    return sorted(hands, key=lambda hand: (hand.type.value, card_order(hand.cards, joker)))
+    order = np.argsort(encode_hands(hands, joker), kind='stable')
+    return [hands[i] for i in order]
+
+CARD_ORDER = {**{str(i): i for i in range(2, 10)}, 'T': 10, 'J': 11, 'Q': 12, 'K': 13, 'A': 14}
+JOKER_ORDER = {**CARD_ORDER, 'J': 0}
 
 def card_order(cards, joker=False):
-    order = {'T': 10, 'J': 11 if not joker else 0, 'Q': 12, 'K': 13, 'A': 14}
-    return tuple(order[c] if c in order else int(c) for c in cards)
+    order = JOKER_ORDER if joker else CARD_ORDER
+    return tuple(order[c] for c in cards)
+
+# One integer per hand that sorts like (type, card_order): the hand type in
+# the high bits, then each card's rank (0-14) in 4 bits, first card highest.
+def hand_key(hand, joker=False):
+    order = JOKER_ORDER if joker else CARD_ORDER
+    key = hand.type.value
+    for c in hand.cards:
+        key = key << 4 | order[c]
+    return key
+
+def encode_hands(hands, joker=False):
+    return np.fromiter((hand_key(hand, joker) for hand in hands), dtype=np.int64, count=len(hands))
 
 def group_cards(s):
     groups = groupby(sorted(s))
@@ -122,7 +198,72 @@ def has_group_of_size(groups, size):
     return any(count == size for count in groups.values())
 
 def total_winnings(hands):
-    return sum(hand.bid * (i+1) for i, hand in enumerate(hands))
+    bids = np.fromiter((hand.bid for hand in hands), dtype=np.int64, count=len(hands))
+    return int(bids @ np.arange(1, len(hands) + 1))
+
+# Hands ranked as they arrive: Fenwick trees over the (type, cards) keys
+# hold the count and the bid total of the hands at or below each key,
+# so insert and remove are O(log n) and the total winnings stay current.
+# The trees are dicts, so only the nodes on the paths of inserted keys take memory.
+# Identical hands tie; as in rank_hands, the earliest inserted is ranked lowest,
+# and the bids of each key's copies are kept in that order to find a removed one.
+class RankedHands:
+    SIZE = 7 * 13**5
+
+    def __init__(self, joker=False):
+        order = JOKER_ORDER if joker else CARD_ORDER
+        self.labels = {label: i for i, label in enumerate(sorted(order, key=order.get))}
+        self.counts = {}
+        self.bids = {}
+        self.copies = {}
+        self.length = 0
+        self.bid_total = 0
+        self.total = 0
+
+    def __len__(self):
+        return self.length
+
+    # 1-based position of the hand in the trees
+    def key(self, hand):
+        key = hand.type.value - 1
+        for c in hand.cards:
+            key = key * 13 + self.labels[c]
+        return key + 1
+
+    def insert(self, hand):
+        k = self.key(hand)
+        below = self.prefix(self.counts, k)
+        self.total += hand.bid * (below + 1) + self.bid_total - self.prefix(self.bids, k)
+        self.update(k, 1, hand.bid)
+        self.copies.setdefault(k, []).append(hand.bid)
+
+    # Raises ValueError if the hand isn't ranked
+    def remove(self, hand):
+        k = self.key(hand)
+        copies = self.copies.get(k, [])
+        j = copies.index(hand.bid)
+        below = self.prefix(self.counts, k - 1) + j
+        above = self.bid_total - self.prefix(self.bids, k) + sum(copies[j+1:])
+        self.total -= hand.bid * (below + 1) + above
+        self.update(k, -1, -hand.bid)
+        del copies[j]
+        if not copies:
+            del self.copies[k]
+
+    def update(self, k, count, bid):
+        self.length += count
+        self.bid_total += bid
+        while k <= self.SIZE:
+            self.counts[k] = self.counts.get(k, 0) + count
+            self.bids[k] = self.bids.get(k, 0) + bid
+            k += k & -k
+
+    def prefix(self, tree, k):
+        result = 0
+        while k > 0:
+            result += tree.get(k, 0)
+            k -= k & -k
+        return result
 
 class TestSolution(unittest.TestCase):
     def test(self):
@@ -132,6 +273,10 @@ class TestSolution(unittest.TestCase):
         # 77888 and 77788: 77888 is stronger because its third card is stronger
         self.assertEqual(sorted(['77888', '77788'], key=card_order), ['77788', '77888'])
 
+        self.assertEqual(hand_key(Hand('33332', HandType.FOUR_OF_A_KIND, 0)), 0x633332)
+        self.assertEqual(hand_key(Hand('T55J5', HandType.FOUR_OF_A_KIND, 0), True), 0x6A5505)
+        self.assertEqual(hand_key(Hand('AKQJT', HandType.HIGH_CARD, 0)), 0x1EDCBA)
+
         self.assertEqual(classify_hand('KTJJT'), HandType.TWO_PAIR)
         self.assertEqual(classify_hand('KK677'), HandType.TWO_PAIR)
         self.assertEqual(classify_hand('QQQJA'), HandType.THREE_OF_A_KIND)
@@ -156,6 +301,23 @@ class TestSolution(unittest.TestCase):
         self.assertEqual(classify_hand_joker('3JJJJ'), HandType.FIVE_OF_A_KIND)
         self.assertEqual(classify_hand_joker('JJJJJ'), HandType.FIVE_OF_A_KIND)
 
+        self.assertEqual(hand_index('22222'), 0)
+        self.assertEqual(hand_index('AAAAA'), 13**5 - 1)
+        samples = ['KTJJT', 'KK677', 'QQQJA', 'T55J5', '23456', '2345J', '2344J', '2244J', '2444J', '4444J',
+                   '234JJ', '244JJ', '444JJ', '23JJJ', '33JJJ', '3JJJJ', 'JJJJJ', 'AAAAA', 'AA8AA', '23332']
+        samples += [LABELS[i % 13] + LABELS[i * 7 % 13] + LABELS[i * 5 % 11] + LABELS[i % 4] + LABELS[i * 3 % 13] for i in range(500)]
+        indexes = np.array([hand_index(x) for x in samples])
+        self.assertEqual([HandType(x) for x in classify_indexes(indexes)], [classify_hand(x) for x in samples])
+        self.assertEqual([HandType(x) for x in classify_indexes(indexes, True)], [classify_hand_joker(x) for x in samples])
+
+        # the tables are saved with an .npz extension and loaded back from it
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'hand-types')
+            self.assertEqual(get_hands(['KTJJT 1'], True, path), [Hand('KTJJT', HandType.FOUR_OF_A_KIND, 1)])
+            self.assertTrue(os.path.exists(path + '.npz'))
+            hand_type_tables.cache_clear()
+            self.assertEqual(classify_indexes(indexes, True, path + '.npz').tolist(), classify_indexes(indexes, True).tolist())
+
         input_data = textwrap.dedent("""
         32T3K 765
         T55J5 684
@@ -184,6 +346,11 @@ class TestSolution(unittest.TestCase):
         self.assertEqual(ranked_hands[4].cards, 'KTJJT')
         self.assertEqual(total_winnings(ranked_hands), 5905)
 
+        for joker in [False, True]:
+            hands = get_hands(input_data, joker)
+            self.assertEqual(hand_indexes(hands).tolist(), [hand_index(hand.cards) for hand in hands])
+            self.assertEqual([HandType(x) for x in classify_indexes(hand_indexes(hands), joker)], [hand.type for hand in hands])
+
         input_data = textwrap.dedent("""
         2345A 1
         Q2KJJ 13
@@ -216,6 +383,31 @@ class TestSolution(unittest.TestCase):
         ranked_hands = rank_hands(hands, True)
         self.assertEqual(total_winnings(ranked_hands), 6839)
 
+        for joker in [False, True]:
+            hands = get_hands(input_data, joker)
+            ranked = RankedHands(joker)
+            for i, hand in enumerate(hands):
+                ranked.insert(hand)
+                self.assertEqual(ranked.total, total_winnings(rank_hands(hands[:i+1], joker)))
+            for hand in hands[::2]:
+                ranked.remove(hand)
+            self.assertEqual(len(ranked), len(hands[1::2]))
+            self.assertEqual(ranked.total, total_winnings(rank_hands(hands[1::2], joker)))
+
+        # identical cards with different bids: the removed copy is the one with its bid
+        hands = get_hands(['23456 5', 'KK677 10', 'KK677 1000'])
+        ranked = RankedHands()
+        for hand in hands:
+            ranked.insert(hand)
+        self.assertEqual(ranked.total, total_winnings(rank_hands(hands)))
+        ranked.remove(hands[1])
+        self.assertEqual(ranked.total, 2005)
+        self.assertEqual(ranked.total, total_winnings(rank_hands([hands[0], hands[2]])))
+        ranked.insert(hands[1])
+        ranked.remove(hands[2])
+        self.assertEqual(ranked.total, total_winnings(rank_hands([hands[0], hands[1]])))
+        self.assertRaises(ValueError, ranked.remove, hands[2])
+
 if __name__ == "__main__":
     # Run unit tests if the script was run with the --test argument
     if '--test' in sys.argv:
@@ -1,12 +1,21 @@
+from array import array
 from collections import namedtuple
 from functools import reduce
+from itertools import product
+from unittest import mock
 import math
+import numpy as np
 import sys
 import textwrap
 import unittest
 
-MapData = namedtuple('MapData', ['instructions', 'network'])
+MapData = namedtuple('MapData', ['instructions', 'network', 'compiled'], defaults=[None])
 Node = namedtuple('Node', ['name', 'L', 'R'])
+Network = namedtuple('Network', ['names', 'ids', 'left', 'right'])
+Steps = namedtuple('Steps', ['end', 'hit'])
+Ghost = namedtuple('Ghost', ['start', 'length', 'before', 'residues'])
+Distances = namedtuple('Distances', ['ids', 'phases', 'steps'])
+Route = namedtuple('Route', ['network', 'target', 'moves'])
 all_z = lambda x: x.name == 'ZZZ'
 end_z = lambda x: x.name.endswith('Z')
 
@@ -14,11 +23,12 @@ def run():
     with open("./input/2023-d08-input.txt", 'r') as file:
         input_data = [line.strip() for line in file.readlines()]
 
-    desert_map = create_map(input_data)
-    print("** Part 1 Final: ", walk(desert_map, desert_map.network['AAA'], 0, all_z))
+    desert_map = create_map(input_data, True)
+    steps = super_steps(desert_map, all_z)
+    print("** Part 1 Final: ", jump_walk(desert_map, steps, desert_map.network['AAA'], 0))
     print("** Part 2 Final: ", ghost_walk(desert_map))
 
-def create_map(input_data):
+def create_map(input_data, compile=False):
     instructions = list(input_data.pop(0))
     input_data.pop(0) # empty line
     nodes = {}
@@ -27,8 +37,100 @@ def create_map(input_data):
         edges = edges.replace('(', '').replace(')', '').split(', ')
         nodes[node] = Node(node, edges[0], edges[1])
 
+    if compile:
+        return MapData(instructions, nodes, compile_network(nodes))
     return MapData(instructions, nodes)
 
+# Number the nodes, and keep left and right successors as arrays of node ids
+def compile_network(nodes):
+    names = list(nodes)
+    ids = {name: i for i, name in enumerate(names)}
+    left = array('l', (ids[nodes[name].L] for name in names))
+    right = array('l', (ids[nodes[name].R] for name in names))
+    return Network(names, ids, left, right)
+
+# The compiled network with the target flag of every node id and the successor
+# array for every instruction, built once and shared by the walks over a map
+def compile_route(map, fn):
+    network = map.compiled or compile_network(map.network)
+    target = [fn(map.network[name]) for name in network.names]
+    moves = [network.left if x == 'L' else network.right for x in map.instructions]
+    return Route(network, target, moves)
+
+# For every node, follow one full pass of the instructions:
+# end[n] is the node where the pass finishes, hit[n] is the first step (1-based)
+# of the pass that lands on a node matching fn, or 0 if it never does.
+def super_steps(map, fn):
+    network = map.compiled
+    target = [fn(map.network[name]) for name in network.names]
+    moves = [network.left if x == 'L' else network.right for x in map.instructions]
+    end = array('l')
+    hit = array('l')
+    for n in range(len(network.names)):
+        first = 0
+        for i, move in enumerate(moves):
+            n = move[n]
+            if first == 0 and target[n]:
+                first = i + 1
+        end.append(n)
+        hit.append(first)
+    return Steps(end, hit)
+
+# walk, one full pass of the instructions at a time
+def jump_walk(map, steps, start_node, i):
+    node = map.compiled.ids[start_node.name]
+    for _ in range(len(steps.end) + 1):
+        if steps.hit[node]:
+            return i + steps.hit[node]
+        i += len(map.instructions)
+        node = steps.end[node]
+    raise ValueError(f'No target reachable from {start_node.name}')
+
+# Label every (node, instruction index) state with the number of steps to the
+# first node matching fn, working backwards from the states that step onto a target.
+# State n * len(instructions) + i is node n about to follow instruction i; -1 if no target is reachable.
+# The node ids are kept alongside, so a query is a single lookup.
+def target_distances(map, fn, route=None):
+    network, target, moves = route or compile_route(map, fn)
+    phases = len(moves)
+    size = len(network.names) * phases
+    following = array('l', bytes(size * array('l').itemsize))
+    for n in range(len(network.names)):
+        for i, move in enumerate(moves):
+            following[n * phases + i] = move[n] * phases + (i + 1) % phases
+
+    # predecessors of each state, grouped by state
+    offsets = array('l', bytes((size + 1) * array('l').itemsize))
+    for s in following:
+        offsets[s + 1] += 1
+    for s in range(size):
+        offsets[s + 1] += offsets[s]
+    fill = offsets[:-1]
+    previous = array('l', bytes(size * array('l').itemsize))
+    for s, f in enumerate(following):
+        previous[fill[f]] = s
+        fill[f] += 1
+
+    steps = array('l', [-1]) * size
+    frontier = [s for s in range(size) if target[following[s] // phases]]
+    for s in frontier:
+        steps[s] = 1
+    while frontier:
+        next = []
+        for s in frontier:
+            for p in previous[offsets[s]:offsets[s + 1]]:
+                if steps[p] < 0:
+                    steps[p] = steps[s] + 1
+                    next.append(p)
+        frontier = next
+    return Distances(network.ids, phases, steps)
+
+def distance_to_target(distances, start_node, i=0):
+    distance = distances.steps[distances.ids[start_node.name] * distances.phases + i % distances.phases]
+    if distance < 0:
+        raise ValueError(f'No target reachable from {start_node.name}')
+    return distance
+
 # Part 1
 # Starting with AAA, you need to look up the next element
 # based on the next left/right instruction in your input.
@@ -39,8 +141,82 @@ def create_map(input_data):
 
 def ghost_walk(map):
     a_nodes = [x for x in map.network.values() if x.name.endswith('A')]
-    scores = [(x, walk(map, x, 0, end_z)) for x in a_nodes]
-    return lcm_multiple([x[1] for x in scores])
+    route = compile_route(map, end_z)
+    ghosts = [find_cycle(map, x, end_z, route) for x in a_nodes]
+    return solve_ghosts(ghosts)
+
+# Follow a ghost until its (node, instruction index) state repeats.
+# The ghost enters its cycle at step `start` and repeats every `length` steps.
+# `before` holds the steps before the cycle that land on a target;
+# a step t >= start lands on a target if (t - start) % length is in `residues`.
+def find_cycle(map, start_node, fn, route=None):
+    network, target, moves = route or compile_route(map, fn)
+    seen = {}
+    hits = []
+    node = network.ids[start_node.name]
+    t = 0
+    while (node, t % len(moves)) not in seen:
+        seen[(node, t % len(moves))] = t
+        if target[node]:
+            hits.append(t)
+        node = moves[t % len(moves)][node]
+        t += 1
+    start = seen[(node, t % len(moves))]
+    return Ghost(start, t - start,
+                 {x for x in hits if x < start},
+                 sorted(x - start for x in hits if x >= start))
+
+def on_target(ghost, t):
+    if t < ghost.start:
+        return t in ghost.before
+    return (t - ghost.start) % ghost.length in ghost.residues
+
+# First step (>= 1) where every ghost is on a target at the same time, or None
+def solve_ghosts(ghosts):
+    settled = max(1, max(g.start for g in ghosts))
+
+    # before every ghost has settled into its cycle, check the steps where the first one hits
+    first = ghosts[0]
+    early = sorted(t for t in first.before | set(
+        first.start + r + k * first.length
+        for r in first.residues
+        for k in range(max(0, settled - first.start) // first.length + 1)) if 1 <= t < settled)
+    for t in early:
+        if all(on_target(g, t) for g in ghosts):
+            return t
+
+    # t = start + residue (mod length) for each ghost
+    options = [sorted({(g.start + r) % g.length for r in g.residues}) for g in ghosts]
+    if all(x == [0] for x in options):
+        # every ghost hits once per cycle, at a multiple of its cycle length
+        period = lcm_multiple([g.length for g in ghosts])
+        return -(-settled // period) * period
+
+    best = None
+    for combo in product(*options):
+        congruence = (0, 1)
+        for a, g in zip(combo, ghosts):
+            congruence = crt(congruence, (a, g.length))
+            if congruence is None:
+                break
+        if congruence is None:
+            continue
+        a, m = congruence
+        t = a + -(-(settled - a) // m) * m
+        if best is None or t < best:
+            best = t
+    return best
+
+# Combine t = a1 (mod m1) and t = a2 (mod m2); None if they conflict
+def crt(x, y):
+    a1, m1 = x
+    a2, m2 = y
+    g = math.gcd(m1, m2)
+    if (a2 - a1) % g:
+        return None
+    m = m1 // g * m2
+    k = (a2 - a1) // g * pow(m1 // g, -1, m2 // g) % (m2 // g)
+    return ((a1 + k * m1) % m, m)
 
 # THE TOOOOOO LLLOOOOOOONNNNGGGG WAY
 # def ghost_walk(map, start_nodes):
@@ -58,6 +234,41 @@ def ghost_walk(map):
 #                return (i, next_nodes)
 #            nodes = next_nodes
 
+# Simulate all of the ghosts together, one full pass of the instructions at a time.
+# paths[n, k] is the node reached after k+1 instructions starting from node n,
+# so every ghost's pass is a single row lookup and the target check is a mask over the block.
+# Returns the first step where every ghost is on a target (or step `limit`) and the nodes at that step.
+def simulate_ghosts(map, start_nodes, fn=end_z, limit=None, route=None):
+    network, target, _ = route or compile_route(map, fn)
+    mask = np.array(target)
+    left = np.array(network.left, dtype=np.int64)
+    right = np.array(network.right, dtype=np.int64)
+    phases = len(map.instructions)
+    paths = np.empty((len(network.names), phases), dtype=np.int64)
+    nodes = np.arange(len(network.names))
+    for k, instruction in enumerate(map.instructions):
+        nodes = left[nodes] if instruction == 'L' else right[nodes]
+        paths[:, k] = nodes
+
+    if limit is not None and limit < 0:
+        raise ValueError(f'limit must not be negative: {limit}')
+    if limit == 0:
+        return (0, list(start_nodes))
+    nodes = np.array([network.ids[x.name] for x in start_nodes], dtype=np.int64)
+    i = 0
+    while True:
+        block = paths[nodes]
+        hits = mask[block].all(axis=0)
+        if limit is not None:
+            hits[limit - i:] = False
+        if hits.any():
+            k = int(hits.argmax())
+            return (i + k + 1, [map.network[network.names[x]] for x in block[:, k]])
+        if limit is not None and i + phases >= limit:
+            return (limit, [map.network[network.names[x]] for x in block[:, limit - i - 1]])
+        nodes = block[:, -1]
+        i += phases
+
 def lcm(a, b):
     return abs(a*b) // math.gcd(a, b)
 
@@ -103,8 +314,21 @@ class TestSolution(unittest.TestCase):
         ZZZ = (ZZZ, ZZZ)
         """).split('\n')[1:-1]  # split by newline and remove the first and last empty lines
 
-        desert_map = create_map(input_data)
+        desert_map = create_map(input_data, True)
         self.assertEqual(walk(desert_map, desert_map.network['AAA'], 0, all_z), 6)
+        steps = super_steps(desert_map, all_z)
+        self.assertEqual(list(steps.hit), [0, 3, 1])
+        self.assertEqual(jump_walk(desert_map, steps, desert_map.network['AAA'], 0), 6)
+        steps = super_steps(desert_map, lambda x: x.name == 'AAA')
+        self.assertRaises(ValueError, jump_walk, desert_map, steps, desert_map.network['ZZZ'], 0)
+
+        steps = target_distances(desert_map, all_z)
+        self.assertEqual(distance_to_target(steps, desert_map.network['AAA']), 6)
+        self.assertEqual(distance_to_target(steps, desert_map.network['BBB']), 3)
+        self.assertEqual(distance_to_target(steps, desert_map.network['BBB'], 1), 5)
+        self.assertEqual(distance_to_target(steps, desert_map.network['ZZZ']), 1)
+        steps = target_distances(desert_map, lambda x: x.name == 'AAA')
+        self.assertRaises(ValueError, distance_to_target, steps, desert_map.network['ZZZ'])
 
         ## Part 2
         input_data = textwrap.dedent("""
@@ -120,9 +344,59 @@ class TestSolution(unittest.TestCase):
         XXX = (XXX, XXX)
         """).split('\n')[1:-1]  # split by newline and remove the first and last empty lines
 
-        desert_map = create_map(input_data)
+        desert_map = create_map(input_data[:])
+        compiled = []
+        def compile_counted(nodes):
+            compiled.append(nodes)
+            return original(nodes)
+        original = compile_network
+        with mock.patch.dict(globals(), compile_network=compile_counted):
+            self.assertEqual(ghost_walk(desert_map), 6)
+        self.assertEqual(len(compiled), 1)
+        route = compile_route(desert_map, end_z)
+        self.assertEqual(find_cycle(desert_map, desert_map.network['22A'], end_z, route), find_cycle(desert_map, desert_map.network['22A'], end_z))
+        a_nodes = [desert_map.network['11A'], desert_map.network['22A']]
+        self.assertEqual(simulate_ghosts(desert_map, a_nodes), (6, [desert_map.network['11Z'], desert_map.network['22Z']]))
+        self.assertEqual(simulate_ghosts(desert_map, a_nodes, limit=5), (5, [desert_map.network['11B'], desert_map.network['22C']]))
+        self.assertEqual(simulate_ghosts(desert_map, a_nodes, limit=1), (1, [desert_map.network['11B'], desert_map.network['22B']]))
+        self.assertEqual(simulate_ghosts(desert_map, a_nodes, limit=0), (0, a_nodes))
+        self.assertRaises(ValueError, simulate_ghosts, desert_map, a_nodes, limit=-1)
+
+        self.assertEqual(simulate_ghosts(desert_map, a_nodes, route=route), (6, [desert_map.network['11Z'], desert_map.network['22Z']]))
+
+        steps = target_distances(desert_map, end_z, route)
+        self.assertEqual(distance_to_target(steps, desert_map.network['11A']), 2)
+        self.assertEqual(distance_to_target(steps, desert_map.network['22A']), 3)
+        desert_map = create_map(input_data, True)
         self.assertEqual(ghost_walk(desert_map), 6)
 
+        # the first hits (2 and 1) don't line up on a clean cycle: the LCM would say 2
+        input_data = textwrap.dedent("""
+        L
+
+        11A = (11B, 11B)
+        11B = (11Z, 11Z)
+        11Z = (11B, 11B)
+        22A = (22Z, 22Z)
+        22Z = (22B, 22B)
+        22B = (22C, 22C)
+        22C = (22Z, 22Z)
+        33A = (33Z, 33Z)
+        33Z = (33B, 33B)
+        33B = (33B, 33B)
+        """).split('\n')[1:-1]
+
+        desert_map = create_map(input_data, True)
+        ghosts = [find_cycle(desert_map, desert_map.network[x], end_z) for x in ['11A', '22A', '33A']]
+        self.assertEqual(ghosts[0], Ghost(1, 2, set(), [1]))
+        self.assertEqual(ghosts[1], Ghost(1, 3, set(), [0]))
+        self.assertEqual(ghosts[2], Ghost(2, 1, {1}, []))
+        self.assertEqual(solve_ghosts(ghosts[0:2]), 4)
+        self.assertEqual(solve_ghosts(ghosts[1:3]), 1)
+        self.assertEqual(solve_ghosts(ghosts), None)
+        self.assertEqual(crt((1, 4), (3, 6)), (9, 12))
+        self.assertEqual(crt((1, 4), (2, 6)), None)
+
 if __name__ == "__main__":
     # Run unit tests if the script was run with the --test argument
     if '--test' in sys.argv:
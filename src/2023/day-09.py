@@ -1,16 +1,26 @@
+import json
 import numpy as np
 import sys
 import textwrap
 import unittest
 
-def run():
+def run(verbose=False, text=False):
     with open("./input/2023-d09-input.txt", 'r') as file:
         input_data = [line.strip() for line in file.readlines()]
 
     history = full_history(input_data)
-    print(history)
-    print("** Part 1 Final: ", extrapolate_all(history))
-    print("** Part 2 Final: ", extrapolate_all(history, True))
+    if verbose:
+        print(history)
+    report(9, [extrapolate_all(history), extrapolate_all(history, True)], text)
+
+# One JSON record per part, e.g. {"day": 9, "part": 1, "answer": 114},
+# or the plain "** Part N Final" lines
+def report(day, answers, text=False):
+    for part, answer in enumerate(answers, 1):
+        if text:
+            print(f"** Part {part} Final: ", answer)
+        else:
+            print(json.dumps({'day': day, 'part': part, 'answer': int(answer)}))
 
 def full_history(input_data):
     history = []
@@ -57,4 +67,4 @@ if __name__ == "__main__":
     if '--test' in sys.argv:
         unittest.main(argv=['first-arg-is-ignored'], exit=False)
     else:
-        run()
\ No newline at end of file
+        run('--verbose' in sys.argv, '--text' in sys.argv)
\ No newline at end of file
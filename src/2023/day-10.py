@@ -1,17 +1,51 @@
 from collections import namedtuple
+import json
 import sys
 import textwrap
 import unittest
 
-def run():
+NORTH = 1
+SOUTH = 2
+EAST = 4
+WEST = 8
+OPPOSITE = {NORTH: SOUTH, SOUTH: NORTH, EAST: WEST, WEST: EAST}
+PIPE_BITS = {'|': NORTH | SOUTH, '-': EAST | WEST, 'L': NORTH | EAST, 'J': NORTH | WEST, '7': SOUTH | WEST, 'F': SOUTH | EAST}
+PIPES = {v: k for k, v in PIPE_BITS.items()}
+TILE_BITS = bytes(PIPE_BITS.get(chr(i), 0) for i in range(256))
+
+# Tiles as direction bits in a flat bytearray: tile (r, c) is cells[r * cols + c]
+Grid = namedtuple('Grid', ['cells', 'rows', 'cols', 'start'])
+
+def run(render=False, text=False):
     with open("./input/2023-d10-input.txt", 'r') as file:
         input_data = [line.strip() for line in file.readlines()]
 
+    grid = read_grid(input_data)
+    path = trace(grid)
+    enclosed = enclosed_area(path, grid.cols)
+
+    if render:
+        sys.stdout.write(picture(input_data, grid, path))
+    report(10, [depth(path), enclosed], text)
+
+# The box-drawing picture of the grid, with the loop from trace.
+# S is only drawn as a pipe when a loop was found.
+def picture(input_data, grid, path):
     pipes, start = read_pipes(input_data)
-    path = walk(pipes, start)
-    enclosed = scan(pipes, path, len(input_data), len(input_data[0]))
-    print("** Part 1 Final: ", depth(path))
-    print("** Part 2 Final: ", enclosed)
+    if path:
+        pipes[start] = PIPES[grid.cells[grid.start]]
+    out = []
+    scan(pipes, {divmod(x, grid.cols) for x in path}, grid.rows, grid.cols, out)
+    return ''.join(out)
+
+# One JSON record per part, e.g. {"day": 10, "part": 1, "answer": 8},
+# or the plain "** Part N Final" lines
+def report(day, answers, text=False):
+    for part, answer in enumerate(answers, 1):
+        if text:
+            print(f"** Part {part} Final: ", answer)
+        else:
+            print(json.dumps({'day': day, 'part': part, 'answer': int(answer)}))
 
 def read_pipes(input_data):
     pipes = {}
@@ -23,6 +57,65 @@ def read_pipes(input_data):
                 start = (r, c)
     return (pipes, start)
 
+def read_grid(input_data):
+    text = ''.join(input_data)
+    cols = len(input_data[0])
+    cells = bytearray(text.encode().translate(TILE_BITS))
+    start = text.index('S')
+    cells[start] = start_bits(cells, len(input_data), cols, start)
+    return Grid(cells, len(input_data), cols, start)
+
+# S may connect to every neighbor that points back at it (trace picks the two the loop uses)
+def start_bits(cells, rows, cols, start):
+    r, c = divmod(start, cols)
+    bits = 0
+    if r > 0 and cells[start - cols] & SOUTH:
+        bits |= NORTH
+    if r < rows - 1 and cells[start + cols] & NORTH:
+        bits |= SOUTH
+    if c < cols - 1 and cells[start + 1] & WEST:
+        bits |= EAST
+    if c > 0 and cells[start - 1] & EAST:
+        bits |= WEST
+    return bits
+
+# Try each way out of S until one comes back around to it. S is then
+# set to the two directions the loop actually uses.
+# Returns the tiles of the loop in order (as flat indexes), or [] if none closes.
+def trace(grid):
+    for heading in (NORTH, SOUTH, EAST, WEST):
+        if grid.cells[grid.start] & heading:
+            path, arrival = follow(grid, heading)
+            if path:
+                grid.cells[grid.start] = heading | OPPOSITE[arrival]
+                return path
+    return []
+
+# Follow pipes from S, leaving each tile by the direction we didn't enter from.
+# Returns the path and the heading we got back to S with, or ([], None) if it doesn't close.
+def follow(grid, heading):
+    step = {NORTH: -grid.cols, SOUTH: grid.cols, EAST: 1, WEST: -1}
+    visited = bytearray(len(grid.cells))
+    path = [grid.start]
+    visited[grid.start] = 1
+    node = grid.start
+    while heading in step:
+        if heading == EAST and node % grid.cols == grid.cols - 1:
+            break
+        if heading == WEST and node % grid.cols == 0:
+            break
+        node += step[heading]
+        if node < 0 or node >= len(grid.cells) or not grid.cells[node] & OPPOSITE[heading]:
+            break
+        if node == grid.start:
+            return (path, heading) if len(path) > 2 else ([], None)
+        if visited[node]:
+            break
+        visited[node] = 1
+        path.append(node)
+        heading = grid.cells[node] & ~OPPOSITE[heading]
+    return ([], None)
+
 def walk(pipes, start):
     stack = [(start, [])]
     while stack:
@@ -35,10 +128,11 @@ def walk(pipes, start):
                 stack.append((neighbor, visited))
             if len(visited) > 2 and neighbor == start:
                 return visited
-    print(pipes)
     return []
 
-def scan(pipes, path, rows, cols):
+# Count tiles inside the loop, row by row. If out is a list, the
+# box-drawing picture of the grid is appended to it for a single write later.
+def scan(pipes, path, rows, cols, out=None):
     enclosed = 0;
     for r in range(rows):
         inside = False
@@ -53,10 +147,26 @@ def scan(pipes, path, rows, cols):
                 pixel = 'I'
             else:
                 pixel = 'O'
-            print(draw(pixel), end='')
-        print()
+            if out is not None:
+                out.append(draw(pixel))
+        if out is not None:
+            out.append('\n')
     return enclosed
 
+# Shoelace formula for the area inside the loop, then Pick's theorem
+# (area = interior + boundary / 2 - 1) for the number of enclosed tiles.
+# No loop (an empty path) encloses nothing.
+def enclosed_area(path, cols):
+    if not path:
+        return 0
+    twice_area = 0
+    r0, c0 = divmod(path[-1], cols)
+    for node in path:
+        r1, c1 = divmod(node, cols)
+        twice_area += r0 * c1 - r1 * c0
+        r0, c0 = r1, c1
+    return (abs(twice_area) - len(path)) // 2 + 1
+
 def draw(x):
     if x == 'S':
         return 'S'
@@ -147,10 +257,15 @@ class TestSolution(unittest.TestCase):
         pipes, start = read_pipes(input_data)
         path = walk(pipes, start)
         self.assertEqual(depth(path), 4)
+        grid = read_grid(input_data)
+        loop = trace(grid)
+        self.assertEqual(grid.cells[grid.start], SOUTH | EAST)
+        self.assertEqual(depth(loop), 4)
+        self.assertEqual([divmod(x, grid.cols) for x in loop], [(1, 1), (2, 1), (3, 1), (3, 2), (3, 3), (2, 3), (1, 3), (1, 2)])
         enclosed = scan(pipes, path, len(input_data), len(input_data[0]))
         self.assertEqual(enclosed, 1)
+        self.assertEqual(enclosed_area(loop, grid.cols), 1)
 
-        print("------")
         input_data = textwrap.dedent("""
         7-F7-
         .FJ|7
@@ -161,10 +276,32 @@ class TestSolution(unittest.TestCase):
         pipes, start = read_pipes(input_data)
         path = walk(pipes, start)
         self.assertEqual(depth(path), 8)
-        scan(pipes, path, len(input_data), len(input_data[0]))
+        self.assertEqual(depth(trace(read_grid(input_data))), 8)
+        self.assertEqual(trace(read_grid(['S-7', '|.|', 'L--'])), [])
+        self.assertEqual(enclosed_area([], 3), 0)
+        out = []
+        scan(pipes, path, len(input_data), len(input_data[0]), out)
+        self.assertEqual(''.join(out).split('\n')[2], '┌┘I└┐')
+
+        # the picture without a loop leaves S unresolved
+        input_data = ['.|.', '-S-', '...']
+        grid = read_grid(input_data)
+        self.assertEqual(picture(input_data, grid, trace(grid)), 'OOO\nOOO\nOOO\n')
+        input_data = ['S-7', '|.|', 'L-J']
+        grid = read_grid(input_data)
+        self.assertEqual(picture(input_data, grid, trace(grid)), '┌─┐\n│I│\n└─┘\n')
+
+        # a stray pipe points into S as well as the loop
+        input_data = ['..|..', '.FS7.', '.L-J.']
+        pipes, start = read_pipes(input_data)
+        grid = read_grid(input_data)
+        loop = trace(grid)
+        self.assertEqual(len(loop), len(walk(pipes, start)))
+        self.assertEqual(len(loop), 6)
+        self.assertEqual(grid.cells[grid.start], EAST | WEST)
+        self.assertEqual(PIPES[grid.cells[grid.start]], '-')
 
 
-        print("------")
         input_data = textwrap.dedent("""
         .F----7F7F7F7F-7....
         .|F--7||||||||FJ....
@@ -182,8 +319,9 @@ class TestSolution(unittest.TestCase):
         path = walk(pipes, start)
         enclosed = scan(pipes, path, len(input_data), len(input_data[0]))
         self.assertEqual(enclosed, 8)
+        grid = read_grid(input_data)
+        self.assertEqual(enclosed_area(trace(grid), grid.cols), 8)
 
-        print("------")
         input_data = textwrap.dedent("""
         FF7FSF7F7F7F7F7F---7
         L|LJ||||||||||||F--J
@@ -201,10 +339,12 @@ class TestSolution(unittest.TestCase):
         path = walk(pipes, start)
         enclosed = scan(pipes, path, len(input_data), len(input_data[0]))
         self.assertEqual(enclosed, 10)
+        grid = read_grid(input_data)
+        self.assertEqual(enclosed_area(trace(grid), grid.cols), 10)
 
 if __name__ == "__main__":
     # Run unit tests if the script was run with the --test argument
     if '--test' in sys.argv:
         unittest.main(argv=['first-arg-is-ignored'], exit=False)
     else:
-        run()
\ No newline at end of file
+        run('--render' in sys.argv, '--text' in sys.argv)
\ No newline at end of file
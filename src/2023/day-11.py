@@ -1,18 +1,25 @@
+from array import array
+from collections import namedtuple
 from itertools import combinations
+import numpy as np
 import sys
 import textwrap
 import unittest
 
+# Galaxy coordinates (ordered by label) and the empty rows and columns of the image
+Image = namedtuple('Image', ['rows', 'cols', 'empty_rows', 'empty_cols'])
+# Expanded distances are linear in the factor: base + factor * crossed.
+# row_gaps/col_gaps are the empty lines before each galaxy on that axis.
+Expansion = namedtuple('Expansion', ['base', 'crossed', 'rows', 'cols', 'row_gaps', 'col_gaps'])
+
 def run():
     with open("./input/2023-d11-input.txt", 'r') as file:
-        input_data = [line.strip() for line in file.readlines()]
-
-    result = scan(input_data)
-    galaxies = expand(result, 1)
-    print("** Part 1 Final: ", shortest_paths(galaxies))
+        image = scan_stream(file)
 
-    galaxies = expand(result, 1000000-1) #lazy
-    print("** Part 2 Final: ", shortest_paths(galaxies))
+    e = expansion(image)
+    part1, part2 = paths_for_factors(e, [1, 1000000-1])
+    print("** Part 1 Final: ", part1)
+    print("** Part 2 Final: ", part2)
 
 def scan(input_data):
     empty_rows = list(range(len(input_data)))
@@ -54,6 +61,83 @@ def shortest_paths(galaxies):
         result += md(g1, g2)
     return result
 
+# Read the whole image as a byte matrix
+def scan_array(input_data):
+    grid = np.frombuffer(''.join(input_data).encode(), dtype=np.uint8).reshape(len(input_data), -1) == ord('#')
+    rows, cols = np.nonzero(grid)
+    return Image(rows.astype(np.int64), cols.astype(np.int64),
+                 np.flatnonzero(~grid.any(axis=1)),
+                 np.flatnonzero(~grid.any(axis=0)))
+
+# Read the image one row at a time (e.g. from an open file), keeping only the galaxy coordinates
+def scan_stream(lines):
+    rows = array('q')
+    cols = array('q')
+    empty_rows = array('q')
+    occupied = None
+    for row, line in enumerate(lines):
+        galaxies = np.flatnonzero(np.frombuffer(line.strip().encode(), dtype=np.uint8) == ord('#'))
+        if occupied is None:
+            occupied = np.zeros(len(line.strip()), dtype=bool)
+        if galaxies.size:
+            rows.extend([row] * galaxies.size)
+            cols.extend(galaxies.tolist())
+            occupied[galaxies] = True
+        else:
+            empty_rows.append(row)
+    empty_cols = np.flatnonzero(~occupied) if occupied is not None else np.zeros(0, dtype=np.int64)
+    return Image(np.frombuffer(rows, dtype=np.int64), np.frombuffer(cols, dtype=np.int64),
+                 np.frombuffer(empty_rows, dtype=np.int64), empty_cols)
+
+def to_image(x):
+    coords = sorted(x[0].values())
+    return Image(np.array([c[1][0] for c in coords], dtype=np.int64),
+                 np.array([c[1][1] for c in coords], dtype=np.int64),
+                 np.array(x[1], dtype=np.int64),
+                 np.array(x[2], dtype=np.int64))
+
+# Number of empty lines before each coordinate, from a prefix count over the axis
+def empty_before(values, empty):
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    flags = np.zeros(int(values.max()) + 1, dtype=np.int64)
+    flags[empty[empty < len(flags)]] = 1
+    return np.cumsum(flags) - flags
+
+def expand_axis(values, empty, factor):
+    return values + factor * empty_before(values, empty)[values]
+
+# Sum of |a - b| over all pairs: once sorted, each value is larger than
+# every value before it, so it contributes value * i - (sum of the first i values)
+def axis_distance_sum(values):
+    values = np.sort(values)
+    terms = values * np.arange(len(values)) - (np.cumsum(values) - values)
+    return int(terms.astype(object).sum())
+
+def expanded_paths(image, factor):
+    return (axis_distance_sum(expand_axis(image.rows, image.empty_rows, factor))
+            + axis_distance_sum(expand_axis(image.cols, image.empty_cols, factor)))
+
+# Empty line counts never decrease along an axis, so for every pair
+# |expanded a - expanded b| = |a - b| + factor * |gaps a - gaps b|
+def expansion(image):
+    row_gaps = empty_before(image.rows, image.empty_rows)[image.rows]
+    col_gaps = empty_before(image.cols, image.empty_cols)[image.cols]
+    base = axis_distance_sum(image.rows) + axis_distance_sum(image.cols)
+    crossed = axis_distance_sum(row_gaps) + axis_distance_sum(col_gaps)
+    return Expansion(base, crossed, image.rows, image.cols, row_gaps, col_gaps)
+
+def paths_for_factors(e, factors):
+    return [e.base + factor * e.crossed for factor in factors]
+
+# Distance between galaxies a and b (by label) for one expansion factor
+def pair_distance(e, a, b, factor):
+    a -= 1
+    b -= 1
+    base = abs(int(e.rows[a]) - int(e.rows[b])) + abs(int(e.cols[a]) - int(e.cols[b]))
+    crossed = abs(int(e.row_gaps[a]) - int(e.row_gaps[b])) + abs(int(e.col_gaps[a]) - int(e.col_gaps[b]))
+    return base + factor * crossed
+
 def tryRemove(list, x):
     try:
         list.remove(x)
@@ -95,6 +179,28 @@ class TestSolution(unittest.TestCase):
         galaxies = expand(result, 99)
         self.assertEqual(shortest_paths(galaxies), 8410)
 
+        image = to_image(result)
+        self.assertEqual(image.empty_rows.tolist(), [3, 7])
+        self.assertEqual(image.empty_cols.tolist(), [2, 5, 8])
+        self.assertEqual(expand_axis(image.cols, image.empty_cols, 1).tolist(), [g[1] for g in expand(result, 1).values()])
+        self.assertEqual(axis_distance_sum(np.array([5, 1, 3])), 8)
+        self.assertEqual(expanded_paths(image, 1), 374)
+        self.assertEqual(expanded_paths(image, 9), 1030)
+        self.assertEqual(expanded_paths(image, 99), 8410)
+        self.assertEqual(expanded_paths(image, 999999), shortest_paths(expand(result, 999999)))
+
+        for other in [scan_array(input_data), scan_stream(iter(x + '\n' for x in input_data))]:
+            for a, b in zip(other, image):
+                self.assertEqual(a.tolist(), b.tolist())
+
+        e = expansion(image)
+        self.assertEqual(paths_for_factors(e, [0, 1, 9, 99, 999999]), [e.base, 374, 1030, 8410, expanded_paths(image, 999999)])
+        self.assertEqual(pair_distance(e, 1, 7, 1), 15)
+        self.assertEqual(pair_distance(e, 3, 6, 1), 17)
+        self.assertEqual(pair_distance(e, 8, 9, 1), 5)
+        galaxies = expand(result, 99)
+        self.assertEqual(pair_distance(e, 5, 9, 99), md(galaxies[5], galaxies[9]))
+
 if __name__ == "__main__":
     # Run unit tests if the script was run with the --test argument
     if '--test' in sys.argv:
@@ -1,68 +1,184 @@
-from collections import deque, namedtuple
+from collections import namedtuple
 from functools import cache
+from itertools import islice
+from multiprocessing import Process, Queue
+import io
+import mmap
+import numpy as np
+import os
 import sys
 import textwrap
 import unittest
 
 def run():
-    with open("./input/2023-d15-input.txt", 'r') as file:
-        input_data = [line.strip() for line in file.readlines()]
+    path = "./input/2023-d15-input.txt"
+    print("** Part 1 Final: ", hashAll(map_steps(path)))
 
-    inputs = input_data[0].split(',')
     array = MirrorArray()
-    array.arrange_mirrors(inputs)
-    _, power = array.focus_power()
+    array.arrange_mirrors(map_steps(path))
+    print("** Part 2 Final: ", array.total_power())
 
-    print("** Part 1 Final: ", hashAll(inputs))
-    print("** Part 2 Final: ", power)
+# Yield the comma-separated steps from a file-like object (text, binary or mmap)
+# a chunk at a time, so the whole step list is never held in memory.
+def read_steps(file, chunk_size=1 << 16):
+    rest = ''
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode()
+        steps = (rest + chunk).split(',')
+        rest = steps.pop()
+        for step in steps:
+            step = step.strip()
+            if step:
+                yield step
+    rest = rest.strip()
+    if rest:
+        yield rest
+
+def map_steps(path):
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from read_steps(data)
+
+# Group steps into lists of at most size steps
+def batches(inputs, size=1 << 16):
+    inputs = iter(inputs)
+    while batch := list(islice(inputs, size)):
+        yield batch
 
 Mirror = namedtuple('Mirror', ['label', 'focal'])
 
+# Each box maps label -> focal length; dicts keep insertion order, so a
+# replaced lens keeps its slot and a removed one closes the gap.
+# Box powers are recomputed lazily, only for boxes changed since the last total.
 class MirrorArray:
     def __init__(self):
-        self.array = [deque() for _ in range(256)]
+        self.array = [dict() for _ in range(256)]
+        self.power = [0] * 256
+        self.total = 0
+        self.dirty = set()
 
     def arrange_mirrors(self, inputs):
-        for input in inputs:
-            self.mirror_step(input)
+        for batch in batches(inputs):
+            for input, i in zip(batch, step_boxes(batch)):
+                self.mirror_step(input, i)
 
-    def mirror_step(self, input):
+    def mirror_step(self, input, i=None):
         if input.endswith('-'):
             label = input[:-1]
-            i = hashString(label)
-            box = self.array[i]
-            for m in list(box):
-                if m.label == label:
-                    box.remove(m)
-                    break
+            if i is None:
+                i = hashString(label)
+            if self.array[i].pop(label, None) is not None:
+                self.dirty.add(i)
         else:
             label, focal = input.split('=')
-            mirror = Mirror(label, int(focal))
-            i = hashString(label)
-            box = self.array[i]
-            for j, m in enumerate(box):
-                if m.label == label:
-                    box[j] = mirror
-                    break
-            else:
-                box.append(mirror)
+            if i is None:
+                i = hashString(label)
+            self.array[i][label] = int(focal)
+            self.dirty.add(i)
+
+    def box_power(self, i):
+        return sum((1+i) * (j+1) * focal for j, focal in enumerate(self.array[i].values()))
+
+    def total_power(self):
+        for i in self.dirty:
+            power = self.box_power(i)
+            self.total += power - self.power[i]
+            self.power[i] = power
+        self.dirty.clear()
+        return self.total
 
     def focus_power(self):
         lenses = dict()
-        total = 0
         for i in range(256):
-            box = self.array[i]
-            for j, m in enumerate(box):
-                power = (1+i) * (j+1) * m.focal
-                lenses[m.label] = power
-                total += power
-        return lenses, total
+            for j, (label, focal) in enumerate(self.array[i].items()):
+                lenses[label] = (1+i) * (j+1) * focal
+        return lenses, self.total_power()
 
     def test_box(self, i):
-        return self.array[i]
+        return [Mirror(label, focal) for label, focal in self.array[i].items()]
+
+# Box for each step: the hash of its label
+def step_boxes(inputs):
+    labels = [x[:-1] if x.endswith('-') else x.split('=')[0] for x in inputs]
+    return hashBatch(','.join(labels).encode()).tolist()
+
+# Replay the shards of steps from a queue onto one MirrorArray until None arrives,
+# then put its power (or the first error) on results. After an error the rest of
+# the queue is still drained, so the sender never blocks on a full queue.
+def replay_worker(steps, results):
+    array = MirrorArray()
+    error = None
+    for shard in iter(steps.get, None):
+        if error is None:
+            try:
+                for input, i in shard:
+                    array.mirror_step(input, i)
+            except Exception as e:
+                error = e
+    results.put(error if error is not None else array.total_power())
+
+# Steps only interact with steps in the same box, so the sequence can be split
+# by box, replayed on separate workers, and the box powers added back together.
+# Each worker owns the boxes i with i % processes equal to its number and keeps
+# their state; the steps are sent a batch at a time through bounded queues,
+# so memory stays constant however long the stream is.
+def parallel_focus_power(inputs, processes=None, batch_size=1 << 16, backlog=4):
+    processes = processes or os.cpu_count()
+    queues = [Queue(backlog) for _ in range(processes)]
+    results = Queue()
+    workers = [Process(target=replay_worker, args=(queue, results), daemon=True) for queue in queues]
+    for worker in workers:
+        worker.start()
+    try:
+        for batch in batches(inputs, batch_size):
+            shards = [[] for _ in range(processes)]
+            for input, i in zip(batch, step_boxes(batch)):
+                shards[i % processes].append((input, i))
+            for queue, shard in zip(queues, shards):
+                if shard:
+                    queue.put(shard)
+    finally:
+        for queue in queues:
+            queue.put(None)
+    powers = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    for power in powers:
+        if isinstance(power, Exception):
+            raise power
+    return sum(powers)
 
 def hashAll(input):
-    return sum([hashString(x) for x in input])
+    return sum(int(hashBatch(','.join(batch).encode()).sum()) for batch in batches(input))
+
+# 17^k mod 256; 17^16 = 1 (mod 256), so the powers repeat every 16
+POW17 = np.array([pow(17, k, 256) for k in range(16)], dtype=np.int64)
+
+# HASH of every step in a comma-separated byte string.
+# Unrolling hashStep, a step c1..cn hashes to sum(ck * 17^(n-k+1)) mod 256.
+# Empty steps (",," or a trailing ",") hash to 0, like hashString('').
+def hashBatch(data):
+    chars = np.frombuffer(data.strip(), dtype=np.uint8).astype(np.int64)
+    if chars.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    commas = chars == ord(',')
+    breaks = np.flatnonzero(commas)
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [chars.size]))
+    step = np.cumsum(commas) - commas
+    weights = POW17[(ends[step] - np.arange(chars.size)) % 16]
+    weights[commas] = 0
+    # a trailing comma starts an empty step at chars.size, which reduceat can't index
+    hashes = np.zeros(starts.size, dtype=np.int64)
+    inside = starts < chars.size
+    hashes[inside] = np.add.reduceat(chars * weights, starts[inside]) % 256
+    return hashes
 
 @cache
 def hashString(str):
@@ -100,6 +216,17 @@ class TestSolution(unittest.TestCase):
         self.assertEqual(hashString(input[10]), 231)
 
         self.assertEqual(hashAll(input), 1320)
+        self.assertEqual(list(read_steps(io.StringIO(input_data[0] + '\n'), 4)), input)
+        self.assertEqual(list(read_steps(io.BytesIO(input_data[0].encode()), 3)), input)
+        self.assertEqual(hashAll(read_steps(io.StringIO(input_data[0]), 5)), 1320)
+        self.assertEqual([len(x) for x in batches(input, 4)], [4, 4, 3])
+        self.assertEqual(hashBatch(input_data[0].encode()).tolist(), [30, 253, 97, 47, 14, 180, 9, 197, 48, 214, 231])
+        self.assertEqual(hashBatch(b'HASH\n').tolist(), [52])
+        self.assertEqual(hashBatch(b'').tolist(), [])
+        self.assertEqual(hashBatch(b'rn=1,').tolist(), [30, 0])
+        self.assertEqual(hashBatch(b'rn=1,,cm-,\n').tolist(), [30, 0, 253, 0])
+        long_step = 'abcdefghijklmnopqrstuvwxyz0123456789=7'
+        self.assertEqual(hashBatch(f'{long_step},rn=1'.encode()).tolist(), [hashString(long_step), 30])
 
         mirrors = MirrorArray()
 
@@ -136,6 +263,22 @@ class TestSolution(unittest.TestCase):
         self.assertEqual(mirrors.test_box(3), [Mirror('ot', 7), Mirror('ab', 5), Mirror('pc', 6)])
 
         lenses, total = mirrors.focus_power()
+        arranged = MirrorArray()
+        arranged.arrange_mirrors(input)
+        self.assertEqual(arranged.focus_power(), (lenses, total))
+        self.assertEqual(parallel_focus_power(input, 3), 145)
+        self.assertEqual(parallel_focus_power(read_steps(io.StringIO(input_data[0]), 5), 3), 145)
+        self.assertEqual(parallel_focus_power(iter(input), 2), 145)
+        self.assertEqual(parallel_focus_power(read_steps(io.StringIO(input_data[0]), 5), 3, batch_size=2, backlog=1), 145)
+        self.assertRaises(ValueError, parallel_focus_power, ['rn=1', 'cm'], 2)
+        streamed = MirrorArray()
+        streamed.arrange_mirrors(read_steps(io.StringIO(input_data[0]), 7))
+        self.assertEqual(streamed.total_power(), 145)
+        arranged.mirror_step('ot-')
+        self.assertEqual(arranged.total_power(), 145 - 28 - 40 - 72 + 4 * 1 * 5 + 4 * 2 * 6)
+        arranged.mirror_step('ot=7')
+        self.assertEqual(arranged.test_box(3), [Mirror('ab', 5), Mirror('pc', 6), Mirror('ot', 7)])
+        self.assertEqual(arranged.total_power(), 145 - 28 - 40 - 72 + 4 * 1 * 5 + 4 * 2 * 6 + 4 * 3 * 7)
         self.assertEqual(lenses['rn'], 1)
         self.assertEqual(lenses['cm'], 4)
         self.assertEqual(lenses['ot'], 28)